@@ -1,34 +1,47 @@
-import base64
-import json
 import asyncio
+import multiprocessing
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import count, islice, repeat
 from uuid import uuid4
 from datetime import datetime
-from typing import AsyncGenerator, Union
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Union
+
+import orjson
+
+try:
+    import pybase64 as base64
+except ImportError:  # SIMD codec unavailable, use the stdlib one
+    import base64
 
-import pymupdf
-import httpx
 from fastapi import FastAPI, APIRouter, Request
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.background import BackgroundTasks
-from markdown_it import MarkdownIt
 from pydantic import ConfigDict, BaseModel
 from pydantic_ai import Agent
 
 import models.schemas as schemas
 from common.ai import model
 from core.config import config
+from core.task_store import TaskStore
 from common.agent_details import get_agent_response
 from common.a2a import (
     WebhookDetails,
     extract_message_parts,
-    download_file_content,
+    download_file_bytes,
     extract_webhook_details,
+    json_rpc_response,
     send_webhook_notification
 )
 from common.logconfig import log
-
-
-md = MarkdownIt("commonmark", {"breaks": True, "html": True})
+from utils.pdf_extract import (
+    extract_page_range,
+    extract_pdf_text,
+    format_page_section,
+    warm_pdf_worker,
+)
 
 
 class MarkdownToPDFAgentOutput(BaseModel):
@@ -48,38 +61,105 @@ pdf_to_markdown_agent = Agent(
 
 router = APIRouter()
 app = FastAPI()
-active_tasks: dict[str, schemas.Task] = {}
-
-
-def decode_base64_file(base64_data: str) -> str:
-    """Decode base64 file data to base64 string."""
+task_store = TaskStore("pdf-to-markdown")
+
+STREAM_PAGE_BATCH = 10
+# Batches being extracted ahead of the one currently streamed
+STREAM_PAGE_WINDOW = 2
+PDF_CONCURRENCY = config.pdf_max_workers
+# Extracted markdown keyed by a digest of the PDF bytes, in LRU order, so
+# retried or repeated conversions of the same file skip extraction.
+# Both the number of entries and their total size are bounded; sizes are
+# len(text), the byte count for the mostly ASCII text PDFs yield.
+PDF_TEXT_CACHE_SIZE = 64
+PDF_TEXT_CACHE_BYTES = 128 * 1024 * 1024
+pdf_text_cache: OrderedDict[bytes, str] = OrderedDict()
+
+
+def decode_base64_file(base64_data: str) -> bytes:
+    """
+    Decode base64 file data (optionally a data URI) to raw bytes.
+
+    Malformed input raises a ValueError, which callers already report per
+    file.
+    """
     try:
-        if "," in base64_data:
-            base64_data = base64_data.split(",")[1]
-        base64.b64decode(base64_data)
-        return base64_data
+        # The str is decoded directly, with no ASCII-encoded copy. Only a
+        # data URI prefix costs a slice; a bare payload is passed as is.
+        return base64.b64decode(base64_data[base64_data.find(",") + 1 :])
     except Exception as e:
         raise ValueError(f"Failed to decode base64 data: {str(e)}")
 
 
-def extract_pdf_text(pdf_bytes_b64: str) -> str:
-    """Extract text from PDF using base64 encoded bytes."""
+async def read_pdf_bytes(file_content: schemas.FileContent) -> bytes:
+    """Return a file part's raw PDF bytes, decoding inline data or downloading it."""
+    if file_content.bytes:
+        # Decoding is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(decode_base64_file, file_content.bytes)
+    # Remote files are used as downloaded, with no base64 round-trip
+    return await download_file_bytes(file_content.uri)
+
+
+# Extraction is CPU bound, so the async handlers run it in worker
+# processes to keep the event loop free for other requests. Workers load
+# pymupdf as they start, so the first conversion each one picks up does
+# not pay for the import. They are spawned rather than forked from the web
+# process, whose threads and open sockets a fork would copy.
+def create_pdf_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=config.pdf_max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warm_pdf_worker,
+    )
+
+
+pdf_pool = create_pdf_pool()
+
+
+async def run_in_pdf_pool(func: Callable[..., Any], *args) -> Any:
+    """
+    Run func in pdf_pool, replacing the pool if one of its workers died.
+
+    A crashed worker (a MuPDF segfault, an OOM kill) breaks the whole
+    executor, so every call that was in flight on it is retried once on a
+    fresh pool. A file that crashes its worker again fails on its own.
+    """
+    global pdf_pool
+    loop = asyncio.get_running_loop()
+    pool = pdf_pool
     try:
-        pdf_bytes = base64.b64decode(pdf_bytes_b64)
-        doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
-        text_content = []
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # Nothing is awaited between the check and the swap, so callers
+        # failing on the same pool replace it only once.
+        if pdf_pool is pool:
+            log.warning("pdf_pool_broken")
+            pool.shutdown(wait=False, cancel_futures=True)
+            pdf_pool = create_pdf_pool()
+        return await loop.run_in_executor(pdf_pool, func, *args)
 
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text()
-            if text.strip():
-                text_content.append(f"## Page {page_num + 1}\n\n{text}")
 
-        doc.close()
-        return "\n\n".join(text_content)
+async def shutdown() -> None:
+    """Stop the PDF workers, cancelling conversions that have not started."""
+    pdf_pool.shutdown(cancel_futures=True)
 
-    except Exception as e:
-        return f"Error extracting text from PDF: {str(e)}"
+
+async def extract_pdf_text_cached(pdf_bytes: bytes) -> str:
+    """Extract text in the process pool, reusing the result for identical PDFs."""
+    key = hashlib.blake2b(pdf_bytes, digest_size=16).digest()
+    if (pdf_text := pdf_text_cache.get(key)) is not None:
+        pdf_text_cache.move_to_end(key)
+        return pdf_text
+
+    pdf_text = await run_in_pdf_pool(extract_pdf_text, pdf_bytes)
+    if not pdf_text.startswith("Error") and len(pdf_text) <= PDF_TEXT_CACHE_BYTES:
+        pdf_text_cache[key] = pdf_text
+        while (
+            len(pdf_text_cache) > PDF_TEXT_CACHE_SIZE
+            or sum(map(len, pdf_text_cache.values())) > PDF_TEXT_CACHE_BYTES
+        ):
+            pdf_text_cache.popitem(last=False)
+    return pdf_text
 
 
 
@@ -93,39 +173,57 @@ async def process_pdf_task_background(
     """Background task to process PDF files and send webhook."""
 
     try:
-        task = active_tasks[task_id]
-        task.status = schemas.TaskStatus(
+        task = await task_store.get(task_id)
+        task.status = schemas.TaskStatus.model_construct(
             state=schemas.TaskState.working, timestamp=datetime.now()
         )
+        await task_store.set(task)
 
         response_parts = []
         artifacts = []
 
-        for file_content in pdf_filecontent_list:
-            try:
+        # Files are converted concurrently, at most PDF_CONCURRENCY decoded
+        # PDFs at a time. Parts repeating an earlier payload (same bytes or
+        # uri) reuse its result without downloading or decoding it again.
+        semaphore = asyncio.Semaphore(PDF_CONCURRENCY)
+
+        async def convert(file_content: schemas.FileContent) -> str:
+            async with semaphore:
                 log.info("processing_pdf", file_name=file_content.name)
+                pdf_bytes = await read_pdf_bytes(file_content)
+                return await extract_pdf_text_cached(pdf_bytes)
 
-                base64_string = file_content.bytes or await download_file_content(
-                    file_content.uri
-                )
-                pdf_b64 = decode_base64_file(base64_string)
+        unique_files: dict[str, schemas.FileContent] = {}
+        for file_content in pdf_filecontent_list:
+            unique_files.setdefault(file_content.bytes or file_content.uri, file_content)
+        results = await asyncio.gather(
+            *(convert(file_content) for file_content in unique_files.values()),
+            return_exceptions=True,
+        )
+        converted = dict(zip(unique_files, results))
 
-                pdf_text = extract_pdf_text(pdf_b64)
+        for file_content in pdf_filecontent_list:
+            try:
+                pdf_text = converted[file_content.bytes or file_content.uri]
+                if isinstance(pdf_text, Exception):
+                    raise pdf_text
 
                 if pdf_text.startswith("Error"):
-                    response_parts.append(schemas.TextPart(text=f"❌ {pdf_text}"))
+                    response_parts.append(schemas.TextPart.model_construct(
+                        text=f"❌ {pdf_text}")
+                    )
                     continue
 
-                artifact = schemas.Artifact(
+                artifact = schemas.Artifact.model_construct(
                     name=f"{file_content.name}.md",
                     description=f"Markdown conversion of {file_content.name}",
-                    parts=[schemas.TextPart(text=pdf_text)],
+                    parts=[schemas.TextPart.model_construct(text=pdf_text)],
                     index=len(artifacts),
                 )
                 artifacts.append(artifact)
 
                 response_parts.append(
-                    schemas.TextPart(
+                    schemas.TextPart.model_construct(
                         text=f"✅ Successfully converted {file_content.name} to markdown"
                     )
                 )
@@ -136,12 +234,12 @@ async def process_pdf_task_background(
                     "conversion_error", file_name=file_content.name, error=str(e)
                 )
                 response_parts.append(
-                    schemas.TextPart(
+                    schemas.TextPart.model_construct(
                         text=f"❌ Error processing {file_content.name}: {str(e)}"
                     )
                 )
 
-        completion_message = schemas.Message(
+        completion_message = schemas.Message.model_construct(
             message_id=uuid4().hex,
             context_id=task.context_id,
             task_id=task_id,
@@ -149,104 +247,181 @@ async def process_pdf_task_background(
             parts=response_parts,
         )
 
-        task.status = schemas.TaskStatus(
+        task.status = schemas.TaskStatus.model_construct(
             state=schemas.TaskState.completed,
             message=completion_message,
             timestamp=datetime.now(),
         )
         task.artifacts = artifacts
+        await task_store.set(task)
 
         await send_webhook_notification(webhook_details, task)
 
     except Exception as e:
         log.error("task_failed", task_id=task_id, error=str(e))
 
-        error_message = schemas.Message(
-            message_id=uuid4().hex,
-            context_id=task.context_id if task_id in active_tasks else None,
-            task_id=task_id,
-            role="agent",
-            parts=[schemas.TextPart(text=f"❌ Task failed: {str(e)}")],
-        )
-
-        if task_id in active_tasks:
-            active_tasks[task_id].status = schemas.TaskStatus(
+        if task := await task_store.get(task_id):
+            error_message = schemas.Message.model_construct(
+                message_id=uuid4().hex,
+                context_id=task.context_id,
+                task_id=task_id,
+                role="agent",
+                parts=[schemas.TextPart.model_construct(
+                    text=f"❌ Task failed: {str(e)}"
+                )],
+            )
+            task.status = schemas.TaskStatus.model_construct(
                 state=schemas.TaskState.failed,
                 message=error_message,
                 timestamp=datetime.now(),
             )
+            await task_store.set(task)
+
+            await send_webhook_notification(webhook_details, task)
+
+
+async def iter_page_batches(
+    pdf_bytes: bytes,
+) -> AsyncIterator[list[tuple[int, str]]]:
+    """
+    Yield a PDF's pages STREAM_PAGE_BATCH at a time, as each batch finishes.
+
+    At most STREAM_PAGE_WINDOW further batches are extracted ahead of the
+    one being sent, so the first frames go out after one batch rather than
+    the whole document, and only a few batches are held at once.
+    """
+    page_count, pages = await run_in_pdf_pool(
+        extract_page_range, pdf_bytes, 0, STREAM_PAGE_BATCH
+    )
+    yield pages
+
+    starts = iter(range(STREAM_PAGE_BATCH, page_count, STREAM_PAGE_BATCH))
+
+    def submit(start: int) -> asyncio.Future:
+        return asyncio.ensure_future(
+            run_in_pdf_pool(
+                extract_page_range, pdf_bytes, start, start + STREAM_PAGE_BATCH
+            )
+        )
 
-            await send_webhook_notification(webhook_details, active_tasks[task_id])
+    pending = deque(map(submit, islice(starts, STREAM_PAGE_WINDOW)))
+    try:
+        while pending:
+            _, pages = await pending.popleft()
+            if (start := next(starts, None)) is not None:
+                pending.append(submit(start))
+            yield pages
+    finally:
+        for batch in pending:
+            batch.cancel()
+
+
+def message_frame(
+    request_id: str, context_id: str, message_id: str, text: str
+) -> bytes:
+    """
+    Build the SSE frame for a single-text agent message in a stream.
+
+    The envelope is written out as the dict SendMessageResponse would dump
+    to, so per-page frames skip model construction and validation.
+    """
+    response = {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": {
+            "kind": "message",
+            "role": "agent",
+            "parts": [{"kind": "text", "text": text, "metadata": None}],
+            "metadata": None,
+            "message_id": message_id,
+            "context_id": context_id,
+            "task_id": None,
+        },
+        "error": None,
+    }
+    return b"data: " + orjson.dumps(response) + b"\n\n"
 
 
 async def stream_pdf_processing(
     pdf_filecontent_list: list[schemas.FileContent], user_input: str, request_id: str
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[bytes, None]:
     """Stream PDF processing results as JSON-RPC responses."""
-    for file_content in pdf_filecontent_list:
-        try:
-            processing_response = schemas.SendMessageResponse(
-                id=request_id,
-                result=schemas.Message(
-                    message_id=uuid4().hex,
-                    context_id=uuid4().hex,
-                    role="agent",
-                    parts=[schemas.TextPart(text=f"Processing PDF: **{file_content.name}**")],
-                ),
-            )
-            yield f"data: {json.dumps(processing_response.model_dump())}\n\n"
-
-            await asyncio.sleep(0.1)
+    # Every frame belongs to the same response, so they share a context id.
+    # Message ids are a random per-stream prefix plus a frame counter, which
+    # keeps them unique without drawing fresh entropy for every frame.
+    context_id = uuid4().hex
+    message_ids = map("{}{:08x}".format, repeat(uuid4().hex[:24]), count())
+    # Remote files are fetched one file ahead: the next download runs while
+    # the current file streams, and a body is dropped once it is used, so at
+    # most two downloaded files are held at a time.
+    downloads: dict[str, asyncio.Future] = {}
+
+    def prefetch(uri: str) -> asyncio.Future:
+        if uri not in downloads:
+            downloads[uri] = asyncio.ensure_future(download_file_bytes(uri))
+        return downloads[uri]
 
-            base64_string = file_content.bytes or await download_file_content(
-                file_content.uri
-            )
-            pdf_b64 = decode_base64_file(base64_string)
-            pdf_text = extract_pdf_text(pdf_b64)
-
-            if pdf_text.startswith("Error"):
-                error_response = schemas.SendMessageResponse(
-                    id=request_id,
-                    result=schemas.Message(
-                        message_id=uuid4().hex,
-                        context_id=uuid4().hex,
-                        role="agent",
-                        parts=[schemas.TextPart(text=f"❌ {pdf_text}")],
-                    ),
+    try:
+        for index, file_content in enumerate(pdf_filecontent_list):
+            try:
+                yield message_frame(
+                    request_id,
+                    context_id,
+                    next(message_ids),
+                    f"Processing PDF: **{file_content.name}**",
                 )
-                yield f"data: {json.dumps(error_response.model_dump())}\n\n"
-            else:
-                success_response = schemas.SendMessageResponse(
-                    id=request_id,
-                    result=schemas.Message(
-                        message_id=uuid4().hex,
-                        context_id=uuid4().hex,
-                        role="agent",
-                        parts=[schemas.TextPart(text=pdf_text)],
+
+                if not file_content.bytes:
+                    prefetch(file_content.uri)
+                next_uri = next(
+                    (
+                        later.uri
+                        for later in pdf_filecontent_list[index + 1 :]
+                        if not later.bytes and later.uri
                     ),
+                    None,
                 )
-                yield f"data: {json.dumps(success_response.model_dump())}\n\n"
-
-        except Exception as e:
-            log.warning("streaming_conversion_error", file_name=file_content.name, error=str(e))
-            error_response = schemas.SendMessageResponse(
-                id=request_id,
-                result=schemas.Message(
-                    message_id=uuid4().hex,
-                    context_id=uuid4().hex,
-                    role="agent",
-                    parts=[
-                        schemas.TextPart(
-                            text=f"❌ Error processing {file_content.name}: {str(e)}"
+                if next_uri:
+                    prefetch(next_uri)
+
+                if file_content.bytes:
+                    pdf_bytes = await asyncio.to_thread(
+                        decode_base64_file, file_content.bytes
+                    )
+                else:
+                    pdf_bytes = await downloads.pop(file_content.uri)
+
+                # Pages are emitted one frame each, with a batch's frames
+                # flushed together in a single write as soon as the batch is
+                # extracted.
+                async for pages in iter_page_batches(pdf_bytes):
+                    if pages:
+                        yield b"".join(
+                            message_frame(
+                                request_id,
+                                context_id,
+                                next(message_ids),
+                                format_page_section(page_num, text),
+                            )
+                            for page_num, text in pages
                         )
-                    ],
-                ),
-            )
-            yield f"data: {json.dumps(error_response.model_dump())}\n\n"
+                del pdf_bytes
+
+            except Exception as e:
+                log.warning("streaming_conversion_error", file_name=file_content.name, error=str(e))
+                yield message_frame(
+                    request_id,
+                    context_id,
+                    next(message_ids),
+                    f"❌ Error processing {file_content.name}: {str(e)}",
+                )
+    finally:
+        for download in downloads.values():
+            download.cancel()
 
 
 @app.get("/page.html" , response_class=HTMLResponse)
-def read_pdf_to_md(request: Request):
+async def read_pdf_to_md(request: Request):
     return get_agent_response("pdf-to-markdown", request)
 
 
@@ -259,13 +434,17 @@ async def handle_json_rpc(
 ):
     if isinstance(request, schemas.GetTaskRequest):
         task_id = request.params.id
-        if task_id and task_id in active_tasks:
-            return schemas.SendMessageResponse(
-                id=uuid4().hex, result=active_tasks[task_id]
+        if task_id and (task := await task_store.get(task_id)):
+            return json_rpc_response(
+                schemas.SendMessageResponse.model_construct(id=uuid4().hex, result=task)
             )
         else:
-            return schemas.JSONRPCResponse(
-                error=schemas.JSONRPCError(code=404, message="Task not found"),
+            return json_rpc_response(
+                schemas.JSONRPCResponse.model_construct(
+                    error=schemas.JSONRPCError.model_construct(
+                        code=404, message="Task not found"
+                    ),
+                )
             )
 
     if isinstance(request, (schemas.SendMessageRequest, schemas.StreamMessageRequest)):
@@ -276,18 +455,22 @@ async def handle_json_rpc(
         user_input = content_parts.joined_text
 
         if len(content_parts.file_content_list) == 0:
-            return schemas.SendMessageResponse(
-                id=request.id,
-                result=schemas.Message(
-                    message_id=uuid4().hex,
-                    context_id=uuid4().hex,
-                    role="agent",
-                    parts=[
-                        schemas.TextPart(
-                            text="No PDF files detected. Please upload a PDF file to convert to Markdown."
-                        )
-                    ],
-                ),
+            # The reply opens a new context, so one id serves as both
+            reply_id = uuid4().hex
+            return json_rpc_response(
+                schemas.SendMessageResponse.model_construct(
+                    id=request.id,
+                    result=schemas.Message.model_construct(
+                        message_id=reply_id,
+                        context_id=reply_id,
+                        role="agent",
+                        parts=[
+                            schemas.TextPart.model_construct(
+                                text="No PDF files detected. Please upload a PDF file to convert to Markdown."
+                            )
+                        ],
+                    ),
+                )
             )
 
         webhook_details = extract_webhook_details(request.params)
@@ -300,22 +483,23 @@ async def handle_json_rpc(
                 media_type="text/plain",
             )
         else:
+            # A fresh task id doubles as the context id when the caller has none
             task_id = uuid4().hex
-            context_id = request.params.message.context_id or uuid4().hex
+            context_id = request.params.message.context_id or task_id
 
             log.info("task_submitted", task_id=task_id, context_id=context_id)
 
-            task = schemas.Task(
+            task = schemas.Task.model_construct(
                 id=task_id,
                 context_id=context_id,
-                status=schemas.TaskStatus(
+                status=schemas.TaskStatus.model_construct(
                     state=schemas.TaskState.submitted, timestamp=datetime.now()
                 ),
                 artifacts=[],
                 history=[request.params.message],
             )
 
-            active_tasks[task_id] = task
+            await task_store.set(task)
 
             background_tasks.add_task(
                 process_pdf_task_background,
@@ -325,16 +509,21 @@ async def handle_json_rpc(
                 webhook_details,
             )
 
-            return schemas.SendMessageResponse(id=request.id, result=task)
+            return json_rpc_response(
+                schemas.SendMessageResponse.model_construct(id=request.id, result=task)
+            )
 
-    return schemas.JSONRPCResponse(
-        id=getattr(request, "id", None),
-        error=schemas.JSONRPCError(code=400, message="Invalid request method"),
+    return json_rpc_response(
+        schemas.JSONRPCResponse.model_construct(
+            id=getattr(request, "id", None),
+            error=schemas.JSONRPCError.model_construct(
+                code=400, message="Invalid request method"
+            ),
+        )
     )
 
 
-@app.get("/.well-known/agent.json")
-def agent_card():
+def build_agent_card() -> schemas.AgentCard:
     name_suffix = datetime.now() if config.app_env == "local" else ""
     agent_name = f"PDF to Markdown agent {name_suffix}"
 
@@ -371,3 +560,13 @@ def agent_card():
             ),
         ],
     )
+
+
+# The card is static for the life of the process (in local runs the name
+# carries the startup time), so it is serialized once at import.
+agent_card_json = build_agent_card().model_dump_json(by_alias=True)
+
+
+@app.get("/.well-known/agent.json")
+async def agent_card():
+    return Response(content=agent_card_json, media_type="application/json")
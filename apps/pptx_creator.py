@@ -1,7 +1,7 @@
-import subprocess
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 import models.schemas as schemas
 from pydantic import ConfigDict, BaseModel
 from pydantic_ai import Agent
@@ -46,7 +46,7 @@ pptx_agent = Agent(
 )
 
 
-def create_presentation():
+async def create_presentation():
     presentation = PresentationStructure(
         title=SlideTitle(
             main="My awesome presentation",
@@ -60,25 +60,32 @@ def create_presentation():
         ],
     )
 
-    ans = subprocess.check_output(["python", "--version"], text=True)
-    print(ans)
-    ans = subprocess.check_output(["quarto", "render", "slides.qmd"], text=True)
-    print(ans)
+    # Rendered in a child process the event loop awaits, so a render does
+    # not block other requests.
+    proc = await asyncio.create_subprocess_exec(
+        "quarto",
+        "render",
+        "slides.qmd",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(f"quarto render exited with status {proc.returncode}")
+    print(stdout.decode())
 
 
 
 
 if __name__ == "__main__":
-    create_presentation()
+    asyncio.run(create_presentation())
 
 
 @app.get("/page.html", response_class=HTMLResponse)
-def read_pdf_to_md(request: Request):
+async def read_pdf_to_md(request: Request):
     return get_agent_response("podcast-creator", request)
 
 
-@app.get("/.well-known/agent.json")
-def agent_card():
+def build_agent_card() -> schemas.AgentCard:
     return schemas.AgentCard(
         name="PPTX Creator agent",
         description="An agent that generates PowerPoint presentations.",
@@ -116,3 +123,11 @@ def agent_card():
             ),
         ],
     )
+
+
+agent_card_json = build_agent_card().model_dump_json(by_alias=True)
+
+
+@app.get("/.well-known/agent.json")
+async def agent_card():
+    return Response(content=agent_card_json, media_type="application/json")
@@ -1,16 +1,161 @@
 from fastapi import FastAPI, Request, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
+from collections import OrderedDict, deque
 from typing import Optional
 from uuid import uuid4
 import asyncio
+import time
 import httpx
-import json
+import orjson
 
 import models.schemas as schemas
 
-app = FastAPI()
-STREAMS: dict[str, asyncio.Queue] = {}
+app = FastAPI(default_response_class=ORJSONResponse)
+
+
+# Frames buffered per stream before the oldest are dropped, and how long
+# the buffer may stay full before the consumer is treated as stalled.
+STREAM_BUFFER_SIZE = 512
+SLOW_CONSUMER_TIMEOUT = 30
+# Seconds a stream waits for its client to connect before it is discarded
+STREAM_TTL = 300
+# Buffered frames are written to the client in chunks of about this size
+SSE_BATCH_BYTES = 64 * 1024
+
+
+class Stream:
+    """
+    Messages waiting to be sent on one SSE stream.
+
+    Producers append encoded SSE frames to a deque and set an event, and the
+    SSE consumer drains everything buffered each time it wakes. Unlike
+    asyncio.Queue, no getter future is created per message.
+
+    The buffer is bounded so a slow client cannot grow it without limit:
+    when full, the oldest frame is dropped (and counted, so the consumer can
+    report it), and a buffer that stays full for SLOW_CONSUMER_TIMEOUT
+    seconds ends the stream with an error.
+    """
+
+    def __init__(self):
+        self.buffer: deque[bytes] = deque(maxlen=STREAM_BUFFER_SIZE)
+        self.ready = asyncio.Event()
+        self.done = False
+        self.dropped = 0
+        self.full_since: Optional[float] = None
+        self.connected = False
+
+    def put_nowait(self, frame: bytes) -> None:
+        if self.done:
+            return
+
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+            now = time.monotonic()
+            if self.full_since is None:
+                self.full_since = now
+            elif now - self.full_since > SLOW_CONSUMER_TIMEOUT:
+                self.buffer.append(
+                    format_sse_data({"error": {"message": "Slow consumer"}})
+                )
+                self.close()
+                return
+        else:
+            self.full_since = None
+
+        self.buffer.append(frame)
+        self.ready.set()
+
+    def drain(self, max_bytes: int = SSE_BATCH_BYTES) -> bytes:
+        """Pop buffered frames, up to about max_bytes, joined into one chunk."""
+        frames = []
+        size = 0
+        while self.buffer and size < max_bytes:
+            frame = self.buffer.popleft()
+            frames.append(frame)
+            size += len(frame)
+        return b"".join(frames)
+
+    def close(self) -> None:
+        """End the stream once the frames already buffered have been sent."""
+        self.done = True
+        self.ready.set()
+
+
+STREAMS: dict[str, Stream] = {}
+
+
+def open_stream() -> str:
+    """
+    Register a new stream and return its id.
+
+    Connected streams are removed by their SSE consumer when it finishes;
+    one whose client never connects is dropped after STREAM_TTL seconds.
+    """
+    stream_id = uuid4().hex
+    STREAMS[stream_id] = Stream()
+    asyncio.get_running_loop().call_later(STREAM_TTL, expire_stream, stream_id)
+    return stream_id
+
+
+def expire_stream(stream_id: str) -> None:
+    stream = STREAMS.get(stream_id)
+    if stream is not None and not stream.connected:
+        del STREAMS[stream_id]
+
+
+# Shared by every outbound call so agent requests reuse pooled (HTTP/2)
+# connections. Closed by the root app's lifespan, as mounted apps get no
+# lifespan events of their own.
+agent_client = httpx.AsyncClient(
+    # Connection attempts are retried; nothing has been sent at that point,
+    # so a retry can never replay a request or restart a stream.
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(
+            max_keepalive_connections=50, max_connections=200, keepalive_expiry=30
+        ),
+    ),
+    follow_redirects=True,
+    timeout=httpx.Timeout(30, connect=5, pool=5),
+)
+JSON_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+STREAM_HEADERS = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+
+# Agent cards are effectively static, so each is fetched at most once per
+# AGENT_CARD_TTL seconds. Entries hold the fetch task itself, which lets
+# concurrent submits for the same agent share a single request.
+AGENT_CARD_TTL = 300
+AGENT_CARD_CACHE_SIZE = 64
+agent_cards: OrderedDict[str, tuple[float, asyncio.Task]] = OrderedDict()
+
+
+async def fetch_agent_card(agent_card_url: str) -> schemas.AgentCard:
+    res = await agent_client.get(agent_card_url, timeout=10)
+    res.raise_for_status()
+    return schemas.AgentCard(**res.json())
+
+
+async def get_agent_card(agent_card_url: str) -> schemas.AgentCard:
+    """Return an agent's card, fetching it only when no fresh copy is cached."""
+    entry = agent_cards.get(agent_card_url)
+    if entry is None or entry[0] <= time.monotonic():
+        fetch = asyncio.ensure_future(fetch_agent_card(agent_card_url))
+        entry = (time.monotonic() + AGENT_CARD_TTL, fetch)
+        agent_cards[agent_card_url] = entry
+        if len(agent_cards) > AGENT_CARD_CACHE_SIZE:
+            agent_cards.popitem(last=False)
+    agent_cards.move_to_end(agent_card_url)
+
+    try:
+        # Shielded so a cancelled submit does not cancel the shared fetch
+        return await asyncio.shield(entry[1])
+    except Exception:
+        if agent_cards.get(agent_card_url) is entry:
+            del agent_cards[agent_card_url]
+        raise
 
 
 class FileInput(BaseModel):
@@ -30,9 +175,68 @@ class SubmitResponse(BaseModel):
     status: str
 
 
-def format_sse_data(data: dict) -> str:
-    """Format data as Server-Sent Events"""
-    return f"data: {json.dumps(data)}\n\n"
+def format_sse_data(data: dict) -> bytes:
+    """Format data as a Server-Sent Events frame, already encoded for the wire."""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+def format_sse_model(model: BaseModel) -> bytes:
+    """Format a model as a Server-Sent Events frame, serialized by pydantic."""
+    return b"data: " + model.model_dump_json().encode() + b"\n\n"
+
+
+# Output modes the request handler asks every agent for
+ACCEPTED_OUTPUT_MODES = ["text/plain", "application/pdf", "image/jpeg", "image/png"]
+
+
+def encode_agent_request(
+    method: str,
+    text: str,
+    files: list[FileInput],
+    push_url: Optional[str] = None,
+) -> bytes:
+    """
+    Serialize the JSON-RPC request forwarding a submission to an agent.
+
+    The body is written out as the dict the Send/StreamMessageRequest models
+    would dump to with exclude_none, so a submit builds no request models.
+    It is encoded once here, and the background senders post the bytes as
+    is.
+    """
+    parts = [{"kind": "text", "text": text}] if text else []
+    parts.extend(
+        {
+            "kind": "file",
+            "file": {"name": f.name, "mime_type": f.mimeType, "bytes": f.bytes},
+        }
+        for f in files
+    )
+    configuration = {
+        "accepted_output_modes": ACCEPTED_OUTPUT_MODES,
+        "history_length": 0,
+    }
+    if push_url:
+        configuration["push_notification_config"] = {"url": push_url}
+
+    # The request and its message carry one id between them; they are
+    # separate namespaces, so a single uuid4() keeps both unique.
+    request_id = uuid4().hex
+    return orjson.dumps(
+        {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": method,
+            "params": {
+                "message": {
+                    "kind": "message",
+                    "role": "user",
+                    "parts": parts,
+                    "message_id": request_id,
+                },
+                "configuration": configuration,
+            },
+        }
+    )
 
 
 @app.post("/submit/", response_model=SubmitResponse)
@@ -46,9 +250,7 @@ async def submit_message(
 
     if not agent_path:
         # For errors, we still need to create a stream to send the error through SSE
-        stream_id = uuid4().hex
-        queue = asyncio.Queue()
-        STREAMS[stream_id] = queue
+        stream_id = open_stream()
         
         # Send error to stream
         background_tasks.add_task(send_error_to_stream, stream_id, {
@@ -63,15 +265,10 @@ async def submit_message(
     agent_card_url = f"{agent_url_base}/.well-known/agent.json"
 
     # Create stream ID immediately
-    stream_id = uuid4().hex
-    queue = asyncio.Queue()
-    STREAMS[stream_id] = queue
+    stream_id = open_stream()
 
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            res = await client.get(agent_card_url)
-            res.raise_for_status()
-            agent_card = schemas.AgentCard(**res.json())
+        agent_card = await get_agent_card(agent_card_url)
     except Exception as e:
         # Send error to stream
         background_tasks.add_task(send_error_to_stream, stream_id, {
@@ -85,71 +282,28 @@ async def submit_message(
     capabilities = agent_card.capabilities
     agent_url = agent_card.url
 
-    message_id = uuid4().hex
-
-    # Build message parts
-    parts: list[schemas.Part] = []
-    if text:
-        parts.append(schemas.TextPart(text=text))
-    for f in files:
-        parts.append(
-            schemas.FilePart(
-                file=schemas.FileContent(
-                    name=f.name, mime_type=f.mimeType, bytes=f.bytes
-                )
-            )
-        )
-
-    message = schemas.Message(
-        kind="message",
-        role="user",
-        parts=parts,
-        message_id=message_id,
-    )
-
-    configuration = schemas.MessageSendConfiguration(
-        accepted_output_modes=[
-            "text/plain",
-            "application/pdf",
-            "image/jpeg",
-            "image/png",
-        ],
-        history_length=0,
-    )
-
     # Handle different agent capabilities
     if capabilities.push_notifications:
         # Use webhook
-        configuration.push_notification_config = schemas.PushNotificationConfig(
-            url=f"{base_url}/webhook/{stream_id}"
+        request_body = encode_agent_request(
+            "message/send", text, files, push_url=f"{base_url}/webhook/{stream_id}"
         )
-        params = schemas.MessageSendParams(message=message, configuration=configuration)
-
         background_tasks.add_task(
-            send_rpc_to_agent_webhook,
-            agent_url,
-            schemas.SendMessageRequest(params=params),
-            stream_id,
+            send_rpc_to_agent_webhook, agent_url, request_body, stream_id
         )
 
     elif capabilities.streaming:
         # Direct streaming
-        params = schemas.MessageSendParams(message=message, configuration=configuration)
+        request_body = encode_agent_request("message/stream", text, files)
         background_tasks.add_task(
-            forward_stream_to_sse,
-            agent_url,
-            schemas.StreamMessageRequest(params=params),
-            stream_id,
+            forward_stream_to_sse, agent_url, request_body, stream_id
         )
 
     else:
         # Blocking fallback
-        params = schemas.MessageSendParams(message=message, configuration=configuration)
+        request_body = encode_agent_request("message/send", text, files)
         background_tasks.add_task(
-            send_blocking_to_sse,
-            agent_url,
-            schemas.SendMessageRequest(params=params),
-            stream_id,
+            send_blocking_to_sse, agent_url, request_body, stream_id
         )
 
     return SubmitResponse(stream_id=stream_id, status="processing")
@@ -158,35 +312,36 @@ async def submit_message(
 @app.get("/stream/{stream_id}")
 async def get_stream(stream_id: str):
     """Get SSE stream for a specific stream ID"""
-    if stream_id not in STREAMS:
-        # Stream doesn't exist, return error stream
+    stream = STREAMS.get(stream_id)
+    if stream is None or stream.connected:
+        # Stream doesn't exist, or already has its consumer: each stream is
+        # drained by exactly one client, since frames are popped as sent.
+        message = "Stream not found" if stream is None else "Stream already connected"
+
         async def error_stream():
-            yield format_sse_data({"error": {"message": "Stream not found"}})
+            yield format_sse_data({"error": {"message": message}})
             yield format_sse_data({"final": True})
         
         return StreamingResponse(error_stream(), media_type="text/event-stream")
 
-    queue = STREAMS[stream_id]
+    stream.connected = True
     
     async def sse_event_stream():
         try:
             while True:
-                item = await queue.get()
-                if item == "__done__":
+                await stream.ready.wait()
+                stream.ready.clear()
+                if stream.dropped:
+                    yield format_sse_data(
+                        {"warning": f"dropped {stream.dropped} messages"}
+                    )
+                    stream.dropped = 0
+                # Frames that arrived together go out in one write
+                while stream.buffer:
+                    yield stream.drain()
+                if stream.done:
                     yield format_sse_data({"final": True})
-                    break
-                
-                # Parse the item if it's a JSON string
-                try:
-                    if isinstance(item, str):
-                        data = json.loads(item)
-                    else:
-                        data = item
-                    yield format_sse_data(data)
-                except json.JSONDecodeError:
-                    # If it's not JSON, wrap it in a text field
-                    yield format_sse_data({"text": str(item)})
-                    
+                    return
         finally:
             STREAMS.pop(stream_id, None)
 
@@ -197,97 +352,112 @@ async def get_stream(stream_id: str):
 @app.post("/webhook/{stream_id}")
 async def receive_webhook(stream_id: str, payload: dict):
     """Receive webhook and route to SSE stream"""
-    if queue := STREAMS.get(stream_id):
-        queue.put_nowait(json.dumps(payload))
+    if stream := STREAMS.get(stream_id):
+        stream.put_nowait(format_sse_data(payload))
         if payload.get("final", False):
-            queue.put_nowait("__done__")
+            stream.close()
     return {"status": "ok"}
 
 
 async def send_error_to_stream(stream_id: str, error_data: dict):
     """Send error to stream and close it"""
-    if queue := STREAMS.get(stream_id):
-        queue.put_nowait(json.dumps({"error": error_data}))
-        queue.put_nowait("__done__")
+    if stream := STREAMS.get(stream_id):
+        stream.put_nowait(format_sse_data({"error": error_data}))
+        stream.close()
 
 
 async def send_rpc_to_agent_webhook(
-    agent_url: str, request_obj: schemas.SendMessageRequest, stream_id: str
+    agent_url: str, request_body: bytes, stream_id: str
 ):
     """Send RPC request for webhook-based agents"""
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            res = await client.post(
-                agent_url,
-                json=request_obj.model_dump(mode="json", exclude_none=True),
-                follow_redirects=True,
-            )
-            res.raise_for_status()
-            response = schemas.SendMessageResponse(**res.json())
-            
-            # If there's an immediate response, send it to the stream
-            if hasattr(response, 'result') and response.result:
-                if queue := STREAMS.get(stream_id):
-                    queue.put_nowait(json.dumps(response.result.model_dump()))
-                    
+        res = await agent_client.post(
+            agent_url,
+            content=request_body,
+            headers=JSON_HEADERS,
+        )
+        res.raise_for_status()
+        response = schemas.SendMessageResponse.model_validate_json(res.content)
+
+        # If there's an immediate response, send it to the stream
+        if response.result is not None:
+            if stream := STREAMS.get(stream_id):
+                stream.put_nowait(format_sse_model(response.result))
+
     except Exception as e:
-        if queue := STREAMS.get(stream_id):
-            queue.put_nowait(json.dumps({"error": {"message": str(e)}}))
-            queue.put_nowait("__done__")
+        if stream := STREAMS.get(stream_id):
+            stream.put_nowait(format_sse_data({"error": {"message": str(e)}}))
+            stream.close()
 
 
 async def send_blocking_to_sse(
-    agent_url: str, request_obj: schemas.SendMessageRequest, stream_id: str
+    agent_url: str, request_body: bytes, stream_id: str
 ):
     """Convert blocking response to SSE stream"""
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            res = await client.post(
-                agent_url,
-                json=request_obj.model_dump(mode="json", exclude_none=True),
-                follow_redirects=True,
-            )
-            res.raise_for_status()
-            response = schemas.SendMessageResponse(**res.json())
-            
-            if queue := STREAMS.get(stream_id):
-                if response.error:
-                    queue.put_nowait(json.dumps({"error": response.error.model_dump()}))
-                elif response.result:
-                    queue.put_nowait(json.dumps(response.result.model_dump()))
-                queue.put_nowait("__done__")
-                
+        res = await agent_client.post(
+            agent_url,
+            content=request_body,
+            headers=JSON_HEADERS,
+        )
+        res.raise_for_status()
+        response = schemas.SendMessageResponse.model_validate_json(res.content)
+
+        if stream := STREAMS.get(stream_id):
+            if response.error:
+                stream.put_nowait(format_sse_data({"error": response.error.model_dump()}))
+            elif response.result is not None:
+                stream.put_nowait(format_sse_model(response.result))
+            stream.close()
+
     except Exception as e:
-        if queue := STREAMS.get(stream_id):
-            queue.put_nowait(json.dumps({"error": {"message": str(e)}}))
-            queue.put_nowait("__done__")
+        if stream := STREAMS.get(stream_id):
+            stream.put_nowait(format_sse_data({"error": {"message": str(e)}}))
+            stream.close()
+
+
+def relay_frame(stream: Stream, frame: bytes) -> None:
+    """Relay one upstream frame (the text between blank lines) to a stream."""
+    for line in frame.splitlines():
+        if line.strip():  # Skip empty lines
+            # Try to parse as JSON, if it fails, send as text
+            try:
+                data = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                data = {"text": line.decode(errors="replace")}
+            stream.put_nowait(format_sse_data(data))
 
 
 async def forward_stream_to_sse(
-    agent_url: str, request_obj: schemas.StreamMessageRequest, stream_id: str
+    agent_url: str, request_body: bytes, stream_id: str
 ):
     """Forward streaming response to SSE format"""
-    async with httpx.AsyncClient(timeout=None) as client:
-        try:
-            async with client.stream(
-                "POST",
-                agent_url,
-                json=request_obj.model_dump(mode="json", exclude_none=True),
-            ) as resp:
-                async for line in resp.aiter_lines():
-                    if line.strip():  # Skip empty lines
-                        if queue := STREAMS.get(stream_id):
-                            # Try to parse as JSON, if it fails, send as text
-                            try:
-                                data = json.loads(line)
-                                queue.put_nowait(json.dumps(data))
-                            except json.JSONDecodeError:
-                                queue.put_nowait(json.dumps({"text": line}))
-                                
-                if queue := STREAMS.get(stream_id):
-                    queue.put_nowait("__done__")
-                    
-        except Exception as e:
-            if queue := STREAMS.get(stream_id):
-                queue.put_nowait(json.dumps({"error": {"message": str(e)}}))
-                queue.put_nowait("__done__")
\ No newline at end of file
+    try:
+        async with agent_client.stream(
+            "POST",
+            agent_url,
+            content=request_body,
+            headers=STREAM_HEADERS,
+            timeout=None,
+        ) as resp:
+            # Split the raw body on blank lines (SSE frame boundaries) so
+            # frames are relayed as bytes, without decoding the body to text
+            # and splitting it line by line.
+            buffer = bytearray()
+            async for chunk in resp.aiter_bytes():
+                buffer += chunk
+                start = 0
+                while (end := buffer.find(b"\n\n", start)) != -1:
+                    if stream := STREAMS.get(stream_id):
+                        relay_frame(stream, bytes(buffer[start:end]))
+                    start = end + 2
+                del buffer[:start]
+
+            if stream := STREAMS.get(stream_id):
+                relay_frame(stream, bytes(buffer))
+                stream.close()
+
+    except Exception as e:
+        if stream := STREAMS.get(stream_id):
+            stream.put_nowait(format_sse_data({"error": {"message": str(e)}}))
+            stream.close()
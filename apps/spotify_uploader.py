@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 import models.schemas as schemas
 from core.config import config
 from common.agent_details import get_agent_response
@@ -9,11 +9,10 @@ app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 
 @app.get("/page.html", response_class=HTMLResponse)
-def read_pdf_to_md(request: Request):
+async def read_pdf_to_md(request: Request):
     return get_agent_response("spotify-uploader", request)
 
-@app.get("/.well-known/agent.json")
-def agent_card():
+def build_agent_card() -> schemas.AgentCard:
     return schemas.AgentCard(
         name="Spotify Uploader agent",
         description="An agent that uploads audio content to Spotify.",
@@ -44,3 +43,11 @@ def agent_card():
             ),
         ],
     )
+
+
+agent_card_json = build_agent_card().model_dump_json(by_alias=True)
+
+
+@app.get("/.well-known/agent.json")
+async def agent_card():
+    return Response(content=agent_card_json, media_type="application/json")
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 from uuid import uuid4
-from fastapi import FastAPI, APIRouter, Request, BackgroundTasks
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from typing import Union
 
 import models.schemas as schemas
@@ -9,18 +9,21 @@ from common.agent_details import get_agent_response
 from common.a2a import (
     extract_message_parts,
     extract_webhook_details,
+    json_rpc_response,
 )
 from datetime import datetime
 from common.ai import model
 from pydantic_ai import Agent
 from core.config import config
+from core.task_store import TaskStore
 
-from services.task_handler import process_tts_task_background, stream_tts_processing
+from services.task_handler import start_tts_task, stream_tts_processing
+from services.tts_converter import gemini_client
 from utils.options import parse_tts_options
 
 router = APIRouter()
 app = FastAPI()
-active_tasks: dict[str, schemas.Task] = {}
+task_store = TaskStore("text-to-speech")
 
 
 class TextToSpeechAgentOutput(BaseModel):
@@ -39,7 +42,7 @@ text_to_speech_agent = Agent(
 )
 
 @app.get("/page.html", response_class=HTMLResponse)
-def read_tts_agent(request: Request):
+async def read_tts_agent(request: Request):
     return get_agent_response("text-to-speech", request)
 
 
@@ -48,17 +51,20 @@ async def handle_json_rpc(
     request: Union[
         schemas.SendMessageRequest, schemas.StreamMessageRequest, schemas.GetTaskRequest
     ],
-    background_tasks: BackgroundTasks,
 ):
     if isinstance(request, schemas.GetTaskRequest):
         task_id = request.params.id
-        if task_id and task_id in active_tasks:
-            return schemas.SendMessageResponse(
-                id=uuid4().hex, result=active_tasks[task_id]
+        if task_id and (task := await task_store.get(task_id)):
+            return json_rpc_response(
+                schemas.SendMessageResponse.model_construct(id=uuid4().hex, result=task)
             )
         else:
-            return schemas.JSONRPCResponse(
-                error=schemas.JSONRPCError(code=404, message="Task not found"),
+            return json_rpc_response(
+                schemas.JSONRPCResponse.model_construct(
+                    error=schemas.JSONRPCError.model_construct(
+                        code=404, message="Task not found"
+                    ),
+                )
             )
 
     if isinstance(request, (schemas.SendMessageRequest, schemas.StreamMessageRequest)):
@@ -66,18 +72,22 @@ async def handle_json_rpc(
         user_input = content_parts.joined_text.strip()
 
         if not user_input:
-            return schemas.SendMessageResponse(
-                id=request.id,
-                result=schemas.Message(
-                    message_id=uuid4().hex,
-                    context_id=uuid4().hex,
-                    role="agent",
-                    parts=[
-                        schemas.TextPart(
-                            text="No text content detected. Please provide text to convert to speech."
-                        ),
-                    ],
-                ),
+            # The reply opens a new context, so one id serves as both
+            reply_id = uuid4().hex
+            return json_rpc_response(
+                schemas.SendMessageResponse.model_construct(
+                    id=request.id,
+                    result=schemas.Message.model_construct(
+                        message_id=reply_id,
+                        context_id=reply_id,
+                        role="agent",
+                        parts=[
+                            schemas.TextPart.model_construct(
+                                text="No text content detected. Please provide text to convert to speech."
+                            ),
+                        ],
+                    ),
+                )
             )
 
         tts_options = parse_tts_options(user_input)
@@ -92,39 +102,43 @@ async def handle_json_rpc(
                 media_type="text/plain",
             )
 
+        # A fresh task id doubles as the context id when the caller has none
         task_id = uuid4().hex
-        context_id = request.params.message.context_id or uuid4().hex
-        task = schemas.Task(
+        context_id = request.params.message.context_id or task_id
+        task = schemas.Task.model_construct(
             id=task_id,
             context_id=context_id,
-            status=schemas.TaskStatus(
+            status=schemas.TaskStatus.model_construct(
                 state=schemas.TaskState.submitted,
                 timestamp=datetime.now(),
             ),
             artifacts=[],
             history=[request.params.message],
         )
-        active_tasks[task_id] = task
-        background_tasks.add_task(
-            process_tts_task_background,
+        await task_store.set(task)
+        start_tts_task(
             task_id,
             user_input,
             webhook_details,
             tts_options,
             api_key,
-            active_tasks
+            task_store
+        )
+        return json_rpc_response(
+            schemas.SendMessageResponse.model_construct(id=request.id, result=task)
         )
-        return schemas.SendMessageResponse(id=request.id, result=task)
 
-    return schemas.JSONRPCResponse(
-        id=getattr(request, "id", None),
-        error=schemas.JSONRPCError(code=400, message="Invalid request method"),
+    return json_rpc_response(
+        schemas.JSONRPCResponse.model_construct(
+            id=getattr(request, "id", None),
+            error=schemas.JSONRPCError.model_construct(
+                code=400, message="Invalid request method"
+            ),
+        )
     )
 
 
-@app.get("/.well-known/agent.json")
-def agent_card():
-    from datetime import datetime
+def build_agent_card() -> schemas.AgentCard:
     name_suffix = datetime.now() if config.app_env == "local" else ""
     return schemas.AgentCard(
         name=f"Text to speech agent {name_suffix}".strip(),
@@ -162,3 +176,17 @@ def agent_card():
             ),
         ],
     )
+
+
+# Serialized once at import; in local runs the name carries the startup time.
+agent_card_json = build_agent_card().model_dump_json(by_alias=True)
+
+
+@app.get("/.well-known/agent.json")
+async def agent_card():
+    return Response(content=agent_card_json, media_type="application/json")
+
+
+async def shutdown() -> None:
+    """Close the Gemini client."""
+    await gemini_client.aclose()
@@ -1,9 +1,32 @@
 import httpx
-import base64
 from typing import NamedTuple, Optional
+from fastapi import Response
+from pydantic import TypeAdapter
 import models.schemas as schemas
 from common.logconfig import log
 
+# Shared across notifications so task updates reuse pooled (HTTP/2)
+# connections instead of a new TCP/TLS handshake per webhook. Closed by the
+# root app's lifespan.
+webhook_client = httpx.AsyncClient(
+    follow_redirects=True,
+    timeout=30.0,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32),
+)
+
+# Shared by remote file downloads; files may take up to a minute to fetch.
+download_client = httpx.AsyncClient(
+    follow_redirects=True,
+    timeout=60.0,
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+)
+
+send_message_response_adapter: TypeAdapter[schemas.SendMessageResponse] = TypeAdapter(
+    schemas.SendMessageResponse
+)
+
 class MessageParts(NamedTuple):
     joined_text: str
     text_parts: list[str]
@@ -17,6 +40,19 @@ class WebhookDetails(NamedTuple):
     api_key: str
 
 
+def json_rpc_response(response: schemas.JSONRPCResponse) -> Response:
+    """
+    Serialize a JSON-RPC response model straight to an HTTP response.
+
+    Returning the model from a route would run FastAPI's jsonable_encoder and
+    then a JSON encoder over the resulting dict; model_dump_json produces the
+    same aliased JSON in one pass.
+    """
+    return Response(
+        content=response.model_dump_json(by_alias=True), media_type="application/json"
+    )
+
+
 def extract_message_parts(
     request: schemas.SendMessageRequest, mime_type_filter: Optional[list[str]] = None
 ) -> MessageParts:
@@ -30,39 +66,37 @@ def extract_message_parts(
     Returns:
         MessageParts
     """
-    text_parts = [
-        part.text for part in request.params.message.parts if part.kind == "text"
-    ]
-
-    file_content_list = [
-        part.file for part in request.params.message.parts if part.kind == "file"
-    ]
-
-    data_parts = [
-        part.data for part in request.params.message.parts if part.kind == "data"
-    ]
-
-    if mime_type_filter:
-        file_content_list = [
-            part for part in file_content_list if part.mime_type in mime_type_filter
-        ]
+    text_parts = []
+    file_content_list = []
+    data_parts = []
+    allowed_mime_types = frozenset(mime_type_filter) if mime_type_filter else None
+
+    # One pass over the parts, dispatching on kind
+    for part in request.params.message.parts:
+        kind = part.kind
+        if kind == "text":
+            text_parts.append(part.text)
+        elif kind == "file":
+            if allowed_mime_types is None or part.file.mime_type in allowed_mime_types:
+                file_content_list.append(part.file)
+        elif kind == "data":
+            data_parts.append(part.data)
 
     joined_text = "\n".join(text_parts)
 
     return MessageParts(joined_text, text_parts, file_content_list, data_parts)
 
 
-async def download_file_content(uri: str) -> str:
+async def download_file_bytes(uri: str) -> bytes:
     """
-    Downloads file content from URI and returns it as a base64-encoded string.
+    Downloads file content from URI and returns the raw bytes.
     We allow for files that take a minute to download for now
     """
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(uri)
-            response.raise_for_status()
-            log.info(f"Successfully downloaded remote file from: {uri}")
-            return base64.b64encode(response.content).decode()
+        response = await download_client.get(uri)
+        response.raise_for_status()
+        log.info(f"Successfully downloaded remote file from: {uri}")
+        return response.content
     except Exception as e:
         raise RuntimeError(f"Failed to download file from {uri}: {str(e)}")
 
@@ -91,28 +125,36 @@ async def send_webhook_notification(
 ):
     """Send task update to webhook URL."""
     try:
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            headers = {"Content-Type": "application/json"}
-            if webhook_details.is_telex:
-                headers["X-TELEX-API-KEY"] = webhook_details.api_key
-
-            a2a_response = schemas.SendMessageResponse(result=task)
-
-            response = await client.post(
-                webhook_details.url,
-                json=a2a_response.model_dump(by_alias=True),
-                headers=headers,
-                timeout=30.0,
-            )
-            log.info(
-                "webhook_sent", status_code=response.status_code, response=response.text
+        headers = {"Content-Type": "application/json"}
+        if webhook_details.is_telex:
+            headers["X-TELEX-API-KEY"] = webhook_details.api_key
+
+        a2a_response = schemas.SendMessageResponse.model_construct(result=task)
+
+        response = await webhook_client.post(
+            webhook_details.url,
+            content=send_message_response_adapter.dump_json(
+                a2a_response, by_alias=True
+            ),
+            headers=headers,
+        )
+        # Error statuses are logged from the response itself; only transport
+        # failures go through the exception path.
+        if response.is_error:
+            log.warning(
+                "webhook_bad_status",
+                status_code=response.status_code,
+                response_text=response.text[:512],
             )
-
-            response.raise_for_status()
+            return
+
+        # Only a prefix of the body is decoded, and only for debug output
+        log.info("webhook_sent", status_code=response.status_code)
+        log.debug(
+            "webhook_response",
+            content_length=len(response.content),
+            response_text=response.content[:256].decode(errors="replace"),
+        )
 
     except Exception as e:
-        log.error(
-            "webhook_failed",
-            error=str(e),
-            response_text=getattr(locals().get("response"), "text", None),
-        )
+        log.error("webhook_failed", error=str(e))
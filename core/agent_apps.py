@@ -1,9 +1,11 @@
+# Only agents that are mounted are imported, so disabled ones cost nothing at
+# startup. Re-enable an import together with its registration below.
 from apps import (
     pdf_to_markdown,
-    pptx_creator,
-    mailer,
-    podcast_creator,
-    spotify_uploader,
+    # pptx_creator,
+    # mailer,
+    # podcast_creator,
+    # spotify_uploader,
     text_to_speech
 )
 
@@ -12,6 +14,7 @@ from core.agent_list import get_agent_config_by_id
 pdf_to_markdown_agent = get_agent_config_by_id("pdf-to-markdown")
 pdf_to_markdown_agent.router = pdf_to_markdown.router
 pdf_to_markdown_agent.app = pdf_to_markdown.app
+pdf_to_markdown_agent.shutdown = pdf_to_markdown.shutdown
 
 # pptx_creator_agent = get_agent_config_by_id("pptx-creator")
 # pptx_creator_agent.router = pptx_creator.router
@@ -28,6 +31,7 @@ pdf_to_markdown_agent.app = pdf_to_markdown.app
 text_to_speed_agent = get_agent_config_by_id("text-to-speech")
 text_to_speed_agent.router = text_to_speech.router
 text_to_speed_agent.app = text_to_speech.app
+text_to_speed_agent.shutdown = text_to_speech.shutdown
 
 AGENT_APPS = [
     pdf_to_markdown_agent,
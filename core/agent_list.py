@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Literal, Optional
+from textwrap import dedent
+from typing import Awaitable, Callable, Literal, Optional
 from fastapi import APIRouter
 from starlette.types import ASGIApp
 
@@ -12,7 +13,7 @@ AgentId = Literal[
     "text-to-speech"
 ]
 
-@dataclass()
+@dataclass(slots=True)
 class AgentConfig:
     id: AgentId
     name: str
@@ -20,6 +21,9 @@ class AgentConfig:
     default_text: str
     router: Optional[APIRouter] = None
     app: Optional[ASGIApp] = None
+    # Releases the agent's own pools and clients; awaited by the root app's
+    # lifespan for mounted agents only
+    shutdown: Optional[Callable[[], Awaitable[None]]] = None
 
 AGENT_CONFIGS: tuple[AgentConfig, ...] = (
     AgentConfig(
@@ -56,18 +60,24 @@ AGENT_CONFIGS: tuple[AgentConfig, ...] = (
         id="text-to-speech", 
         name="Text to Speech",
         description="Converts text to speech.",
-        default_text="""
-        Convert the following convo to speech:
+        # Normalized once here instead of sending the source indentation
+        # with every page render
+        default_text=dedent("""
+            Convert the following convo to speech:
 
-        Authur: Another annoying day to be alive
-        Ford: Yeah, but the earth will be destroyed today.
-        """,
+            Authur: Another annoying day to be alive
+            Ford: Yeah, but the earth will be destroyed today.
+        """).strip(),
     ),
 )
 
+AGENT_CONFIGS_BY_ID: dict[str, AgentConfig] = {
+    config.id: config for config in AGENT_CONFIGS
+}
+
 def get_agent_config_by_id(agent_id: AgentId) -> AgentConfig:
     """Get agent configuration by ID."""
-    for config in AGENT_CONFIGS:
-        if config.id == agent_id:
-            return config
-    raise ValueError(f"Agent with ID '{agent_id}' not found")
\ No newline at end of file
+    try:
+        return AGENT_CONFIGS_BY_ID[agent_id]
+    except KeyError:
+        raise ValueError(f"Agent with ID '{agent_id}' not found") from None
\ No newline at end of file
@@ -64,11 +64,33 @@ class Config:
     minio_bucket_prefix = os.getenv("MINIO_BUCKET_PREFIX")
     minio_bucket_secret_key=os.getenv("MINIO_BUKCET_SECRET_KEY")
 
+    redis_url = os.getenv("REDIS_URL")
+
+    # Streamed TTS results link to the uploaded WAV unless this is set, in
+    # which case the audio is inlined as a base64 data URI
+    tts_inline_audio = os.getenv("TTS_INLINE_AUDIO", "").lower() in ("1", "true")
+    # Background TTS tasks synthesizing at once; the rest wait their turn
+    tts_max_concurrency = int(os.getenv("TTS_MAX_CONCURRENCY", "8"))
+
+    # Seconds idle client connections are kept open; above the usual 60 s
+    # load balancer idle timeout so the proxy, not uvicorn, closes them
+    keep_alive_timeout = int(os.getenv("KEEP_ALIVE_TIMEOUT", "65"))
+
+    # PDF extraction worker processes. Each one holds its own pymupdf and
+    # the documents it is converting, so the pool is capped rather than
+    # sized to every core.
+    pdf_max_workers = int(os.getenv("PDF_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+
+    # Worker threads anyio offers sync handlers and run_in_threadpool calls.
+    # Opt-in: the default of 40 is anyio's own, so it changes nothing unless
+    # THREADPOOL_SIZE is set.
+    threadpool_size = int(os.getenv("THREADPOOL_SIZE", "40"))
+
 def create_config() -> Config:
     base_url = os.getenv("BASE_URL", "http://localhost:5700")
-    base_path = os.getenv("BASE_PATH", "").rstrip("/")
-
-    full_prefix = f"{base_url}{base_path}"
+    # Settings are read from the environment once, when Config is defined;
+    # reuse its base_path rather than reading BASE_PATH again.
+    full_prefix = f"{base_url}{Config.base_path}"
 
     return Config(
         base_url=base_url,
@@ -0,0 +1,101 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import redis.asyncio as redis
+
+import models.schemas as schemas
+from core.config import config
+
+redis_client = redis.from_url(config.redis_url) if config.redis_url else None
+
+# States a task never leaves, so it can be dropped from a local-only store
+TERMINAL_TASK_STATES = frozenset(
+    {
+        schemas.TaskState.completed,
+        schemas.TaskState.canceled,
+        schemas.TaskState.failed,
+        schemas.TaskState.rejected,
+    }
+)
+
+
+class TaskStore:
+    """
+    Task registry for an agent's JSON-RPC handlers.
+
+    Tasks live in a bounded in-process cache. When REDIS_URL is set they are
+    also written to Redis with an expiry, so any worker can answer tasks/get
+    and finished tasks age out instead of accumulating in memory. Another
+    worker may update a task in Redis, so local copies are then only trusted
+    for a few seconds.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int = 3600,
+        local_ttl: int = 5,
+        local_maxsize: int = 256,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        # Without Redis the local cache is the only copy, so it keeps tasks
+        # for the full ttl.
+        self.local_ttl = local_ttl if redis_client else ttl
+        self.local_maxsize = local_maxsize
+        self._local: OrderedDict[str, tuple[float, schemas.Task]] = OrderedDict()
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.namespace}:task:{task_id}"
+
+    def _cache(self, task: schemas.Task) -> None:
+        self._local[task.id] = (time.monotonic() + self.local_ttl, task)
+        self._local.move_to_end(task.id)
+        overflow = len(self._local) - self.local_maxsize
+        if overflow <= 0:
+            return
+        if redis_client is not None:
+            for _ in range(overflow):
+                self._local.popitem(last=False)
+            return
+        # Without Redis an evicted task is lost, so only finished tasks are
+        # evicted, least recently used first; in-flight ones are kept.
+        finished = [
+            task_id
+            for task_id, (_, cached) in self._local.items()
+            if cached.status.state in TERMINAL_TASK_STATES
+        ]
+        for task_id in finished[:overflow]:
+            del self._local[task_id]
+
+    async def get(self, task_id: str) -> Optional[schemas.Task]:
+        if entry := self._local.get(task_id):
+            expires_at, task = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(task_id)
+                return task
+            del self._local[task_id]
+
+        if redis_client is None:
+            return None
+
+        data = await redis_client.get(self._key(task_id))
+        if data is None:
+            return None
+
+        task = schemas.Task.model_validate_json(data)
+        self._cache(task)
+        return task
+
+    async def set(self, task: schemas.Task) -> None:
+        self._cache(task)
+        if redis_client is not None:
+            await redis_client.set(
+                self._key(task.id), task.model_dump_json(by_alias=True), ex=self.ttl
+            )
+
+    async def delete(self, task_id: str) -> None:
+        self._local.pop(task_id, None)
+        if redis_client is not None:
+            await redis_client.delete(self._key(task_id))
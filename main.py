@@ -1,10 +1,13 @@
+import anyio.to_thread
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from core.agent_apps import AGENT_APPS
 from core.config import config
+from common.a2a import download_client, webhook_client
 import apps.request_handler as request_handler_app
 
 from fastapi.responses import RedirectResponse
@@ -12,6 +15,10 @@ from starlette.middleware.base import BaseHTTPMiddleware
 
 # only works for router
 class ForceSlashRedirectMiddleware(BaseHTTPMiddleware):
+    # Slash-terminated route paths, collected on the first request once every
+    # route has been registered
+    slash_paths: frozenset[str] | None = None
+
     async def dispatch(self, request: Request, call_next):
         scope = request.scope
         path = scope["path"]
@@ -20,25 +27,49 @@ class ForceSlashRedirectMiddleware(BaseHTTPMiddleware):
         # - No trailing slash
         # - Path with slash exists in app.routes
         if not path.endswith("/"):
+            if self.slash_paths is None:
+                self.slash_paths = frozenset(
+                    route.path
+                    for route in request.app.routes
+                    if getattr(route, "path", "").endswith("/")
+                )
             new_path = path + "/"
-            for route in request.app.routes:
-                if hasattr(route, "path") and route.path == new_path:
-                    # Maintain method & body via 307
-                    return RedirectResponse(url=new_path, status_code=307)
+            if new_path in self.slash_paths:
+                # Maintain method & body via 307
+                return RedirectResponse(url=new_path, status_code=307)
 
         return await call_next(request)
 
-app = FastAPI(root_path=config.base_path)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = (
+        config.threadpool_size
+    )
+    # Mounted agent apps don't get lifespan events, so shared clients are
+    # closed here, along with whatever each mounted agent holds.
+    yield
+    await webhook_client.aclose()
+    await download_client.aclose()
+    await request_handler_app.agent_client.aclose()
+    for agent in AGENT_APPS:
+        if agent.shutdown is not None:
+            await agent.shutdown()
+
+
+app = FastAPI(root_path=config.base_path, lifespan=lifespan)
 app.add_middleware(ForceSlashRedirectMiddleware)
 
 templates = Jinja2Templates(directory="templates")
 
+# The index depends only on the base path and the mounted agents, neither of
+# which changes after startup, so it is rendered once.
+index_html = templates.get_template("index.html").render(
+    base_path=config.base_path, agents=AGENT_APPS
+)
+
 @app.get("/", response_class=HTMLResponse)
-def read_main(request: Request):
-    return templates.TemplateResponse(
-        "index.html",
-        {"request": request, "base_path": config.base_path, "agents": AGENT_APPS},
-    )
+async def read_main():
+    return HTMLResponse(index_html)
 
 for agent in AGENT_APPS:
     # agent_base_path = f"{config.base_path}" if config.base_path else ""
@@ -51,4 +82,13 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/request-handler", app=request_handler_app.app)
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", port=config.port, host=config.host, reload=True)
+    # uvicorn picks uvloop and httptools on its own when they are installed.
+    # A single worker is kept: SSE streams and the local task cache live in
+    # process memory.
+    uvicorn.run(
+        "main:app",
+        port=config.port,
+        host=config.host,
+        reload=config.app_env == "local",
+        timeout_keep_alive=config.keep_alive_timeout,
+    )
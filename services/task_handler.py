@@ -1,20 +1,117 @@
+import io
 import os
 import time
-import json
 import asyncio
+import hashlib
+from collections import OrderedDict
 from datetime import datetime
 from uuid import uuid4
+import orjson
 from fastapi.responses import StreamingResponse
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
-from utils.file_utils import save_base64_to_file
 from utils.minio import minio_client
-from common.a2a import send_webhook_notification
+from common.a2a import WebhookDetails, send_webhook_notification
 from core.config import config
+from core.task_store import TaskStore
 from common.logconfig import log
 import models.schemas as schemas
 from .tts_converter import convert_text_to_speech_gemini
 
+try:
+    import pybase64 as base64
+except ImportError:  # SIMD codec unavailable, use the stdlib one
+    import base64
+
+
+# Uploaded audio URLs keyed by a digest of (API key, voice, text), in LRU
+# order, so repeated conversions of the same text skip synthesis and upload.
+TTS_AUDIO_CACHE_SIZE = 1024
+TTS_AUDIO_CACHE_TTL = 3600
+tts_audio_cache: OrderedDict[bytes, tuple[float, str, float]] = OrderedDict()
+
+# The bucket location is fixed for the process, so object keys and public
+# URLs are a prefix plus the file name.
+AUDIO_KEY_PREFIX = f"{config.minio_bucket_prefix}/"
+AUDIO_URL_PREFIX = f"https://{config.minio_endpoint}/{config.minio_bucket_name}/{AUDIO_KEY_PREFIX}"
+
+
+def write_audio_file(path: str, wav_bytes: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(wav_bytes)
+
+
+async def save_audio(
+    wav_bytes: bytes, file_id: Optional[str] = None
+) -> tuple[str, bool]:
+    """
+    Upload a WAV file to MinIO and return its URL along with whether the
+    upload succeeded.
+
+    The bytes are streamed to MinIO from memory, in a worker thread since
+    the MinIO client is blocking. Only when the upload fails is the audio
+    written to output/audio, so it is not lost.
+    """
+    # Task ids are already unique, so a task's audio is named after it
+    file_name = f"text_to_speech_output_{file_id or uuid4().hex}.wav"
+
+    try:
+        start = time.monotonic()
+        await asyncio.to_thread(
+            minio_client.put_object,
+            config.minio_bucket_name,
+            AUDIO_KEY_PREFIX + file_name,
+            io.BytesIO(wav_bytes),
+            length=len(wav_bytes),
+            content_type="audio/wav",
+        )
+        upload_time = round(time.monotonic() - start, 2)
+    except Exception as e:
+        log.error(str(e))
+        upload_time = None
+        await asyncio.to_thread(
+            write_audio_file, os.path.abspath(f"output/audio/{file_name}"), wav_bytes
+        )
+
+    url = AUDIO_URL_PREFIX + file_name
+    log.info("converted audio url", url=url, upload_duration=f"{upload_time}s")
+    return url, upload_time is not None
+
+
+async def synthesize_audio_url(
+    user_input: str, voice_name: str, api_key: str, file_id: Optional[str] = None
+) -> tuple[str, float, Optional[bytes]]:
+    """
+    Convert text to speech and upload it, reusing the URL for repeated text.
+
+    Returns the URL, the duration and, only when the upload failed, the WAV
+    bytes, so callers can deliver the audio some other way.
+    """
+    # The API key is part of the key, so audio synthesized (and billed)
+    # under one caller's key is never served to another.
+    key = hashlib.blake2b(
+        f"{api_key}\0{voice_name}\0{user_input}".encode(), digest_size=16
+    ).digest()
+    if entry := tts_audio_cache.get(key):
+        expires_at, url, duration = entry
+        if expires_at > time.monotonic():
+            tts_audio_cache.move_to_end(key)
+            return url, duration, None
+        del tts_audio_cache[key]
+
+    wav_bytes, duration = await convert_text_to_speech_gemini(
+        user_input, voice_name, api_key
+    )
+    url, uploaded = await save_audio(wav_bytes, file_id)
+    if not uploaded:
+        return url, duration, wav_bytes
+
+    tts_audio_cache[key] = (time.monotonic() + TTS_AUDIO_CACHE_TTL, url, duration)
+    if len(tts_audio_cache) > TTS_AUDIO_CACHE_SIZE:
+        tts_audio_cache.popitem(last=False)
+    return url, duration, None
+
 
 async def process_tts_task_background(
     task_id: str,
@@ -22,45 +119,26 @@ async def process_tts_task_background(
     webhook_details,
     options: dict,
     api_key: str,
-    active_tasks: dict,
+    task_store: TaskStore,
 ):
     try:
-        task = active_tasks[task_id]
-        task.status = schemas.TaskStatus(
+        task = await task_store.get(task_id)
+        task.status = schemas.TaskStatus.model_construct(
             state=schemas.TaskState.working, timestamp=datetime.now()
         )
+        await task_store.set(task)
 
-        audio_base64, duration = await convert_text_to_speech_gemini(
-            user_input, options.get("voice_name", "Kore"), api_key
+        url, duration, _ = await synthesize_audio_url(
+            user_input, options.get("voice_name", "Kore"), api_key, task_id
         )
 
-        file_name = f"text_to_speech_output_{uuid4().hex}.wav"
-        relative_path = f"output/audio/{file_name}"
-        absolute_path = os.path.abspath(relative_path)
-        save_base64_to_file(audio_base64, absolute_path)
-
-        try:
-            start = time.time()
-            minio_client.fput_object(
-                config.minio_bucket_name,
-                f"{config.minio_bucket_prefix}/{file_name}",
-                absolute_path,
-            )
-            upload_time = round(time.time() - start, 2)
-        except Exception as e:
-            log.error(str(e))
-            upload_time = None
-
-        url = f"https://{config.minio_endpoint}/{config.minio_bucket_name}/{config.minio_bucket_prefix}/{file_name}"
-        log.info("converted audio url", url=url, upload_duration=f"{upload_time}s")
-
-        artifact = schemas.Artifact(
+        artifact = schemas.Artifact.model_construct(
             name="text_to_speech_audio",
             description=f"Audio conversion ({duration:.1f}s)",
             parts=[
-                schemas.TextPart(text=f"Download: {url}"),
-                schemas.FilePart(
-                    file=schemas.FileContent(
+                schemas.TextPart.model_construct(text=f"Download: {url}"),
+                schemas.FilePart.model_construct(
+                    file=schemas.FileContent.model_construct(
                         uri=url,
                         mime_type="audio/wav",
                         duration_seconds=duration,
@@ -70,51 +148,109 @@ async def process_tts_task_background(
             index=0,
         )
 
-        task.status = schemas.TaskStatus(
+        task.status = schemas.TaskStatus.model_construct(
             state=schemas.TaskState.completed,
             timestamp=datetime.now(),
-            message=schemas.Message(
+            message=schemas.Message.model_construct(
                 message_id=uuid4().hex,
                 context_id=task.context_id,
                 task_id=task.id,
                 role="agent",
                 parts=[
-                    schemas.TextPart(
+                    schemas.TextPart.model_construct(
                         text=f"✅ Successfully converted text to speech ({duration:.1f}s)"
                     )
                 ],
             ),
         )
         task.artifacts = [artifact]
+        await task_store.set(task)
         await send_webhook_notification(webhook_details, task)
 
     except Exception as e:
-        if task_id in active_tasks:
-            task = active_tasks[task_id]
-            task.status = schemas.TaskStatus(
+        if task := await task_store.get(task_id):
+            task.status = schemas.TaskStatus.model_construct(
                 state=schemas.TaskState.failed,
                 timestamp=datetime.now(),
-                message=schemas.Message(
+                message=schemas.Message.model_construct(
                     message_id=uuid4().hex,
                     context_id=task.context_id,
                     task_id=task_id,
                     role="agent",
-                    parts=[schemas.TextPart(text=f"❌ Task failed: {str(e)}")],
+                    parts=[schemas.TextPart.model_construct(
+                        text=f"❌ Task failed: {str(e)}"
+                    )],
                 ),
             )
+            await task_store.set(task)
             await send_webhook_notification(webhook_details, task)
 
 
+# Background conversions are plain event-loop tasks rather than
+# BackgroundTasks, so the webhook response is sent without waiting on them.
+# The set keeps a reference to each task until it finishes.
+tts_semaphore = asyncio.Semaphore(config.tts_max_concurrency)
+tts_tasks: set[asyncio.Task] = set()
+
+
+def start_tts_task(
+    task_id: str,
+    user_input: str,
+    webhook_details: WebhookDetails,
+    options: dict,
+    api_key: str,
+    task_store: TaskStore,
+) -> None:
+    """Schedule process_tts_task_background, bounded by tts_semaphore."""
+
+    async def run():
+        async with tts_semaphore:
+            await process_tts_task_background(
+                task_id, user_input, webhook_details, options, api_key, task_store
+            )
+
+    task = asyncio.create_task(run())
+    tts_tasks.add(task)
+    task.add_done_callback(tts_tasks.discard)
+
+
+def tts_frame(request_id: str, parts: list[dict]) -> bytes:
+    """Build one SSE frame of the TTS stream with orjson."""
+    return (
+        b"data: "
+        + orjson.dumps({"id": request_id, "result": {"parts": parts}})
+        + b"\n\n"
+    )
+
+
 async def stream_tts_processing(
     user_input: str, request_id: str, options: dict, api_key: str
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[bytes, None]:
     awaitable_sleep = asyncio.sleep(0.5)
-    yield f"data: {json.dumps({'id': request_id, 'result': {'parts': [{'text': 'Converting text to speech...'}]}})}\n\n"
+    yield tts_frame(request_id, [{"text": "Converting text to speech..."}])
     await awaitable_sleep
     try:
-        audio_base64, duration = await convert_text_to_speech_gemini(
-            user_input, options["voice_name"], api_key
+        if config.tts_inline_audio:
+            wav_bytes, duration = await convert_text_to_speech_gemini(
+                user_input, options["voice_name"], api_key
+            )
+        else:
+            url, duration, wav_bytes = await synthesize_audio_url(
+                user_input, options["voice_name"], api_key
+            )
+
+        # Link to the upload; inline the audio when asked to, or when the
+        # upload failed and the URL would point at nothing
+        if wav_bytes is None:
+            audio = {"uri": url}
+        else:
+            audio_base64 = (
+                await asyncio.to_thread(base64.b64encode, wav_bytes)
+            ).decode("ascii")
+            audio = {"bytes": f"data:audio/wav;base64,{audio_base64}"}
+        audio.update(mime_type="audio/wav", duration_seconds=duration)
+        yield tts_frame(
+            request_id, [{"text": f"Success ✅ ({duration:.1f}s)"}, {"audio": audio}]
         )
-        yield f"data: {json.dumps({'id': request_id, 'result': {'parts': [{'text': f'Success ✅ ({duration:.1f}s)'}, {'audio': {'bytes': f'data:audio/wav;base64,{audio_base64}', 'mime_type': 'audio/wav', 'duration_seconds': duration}}]}})}\n\n"
     except Exception as e:
-        yield f"data: {json.dumps({'id': request_id, 'result': {'parts': [{'text': f'❌ Error: {str(e)}'}]}})}\n\n"
+        yield tts_frame(request_id, [{"text": f"❌ Error: {str(e)}"}])
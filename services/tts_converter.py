@@ -1,11 +1,51 @@
-import base64
-import io
-import wave
+import asyncio
+import struct
 import httpx
+import orjson
+
+try:
+    import pybase64 as base64
+except ImportError:  # SIMD codec unavailable, use the stdlib one
+    import base64
+
+GEMINI_TTS_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-tts:generateContent"
+
+# Shared so every conversion reuses a warm (HTTP/2) connection to Gemini
+# instead of paying a TLS handshake per call. Closed by the root app's
+# lifespan.
+gemini_client = httpx.AsyncClient(
+    timeout=60.0,
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+)
+
+# Gemini returns raw 16-bit mono PCM at 24 kHz
+SAMPLE_WIDTH, CHANNELS, SAMPLE_RATE = 2, 1, 24000
+
+
+def wav_header(pcm_size: int) -> bytes:
+    """Return the 44-byte RIFF/WAVE header for pcm_size bytes of Gemini PCM."""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + pcm_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        CHANNELS,
+        SAMPLE_RATE,
+        SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH,
+        CHANNELS * SAMPLE_WIDTH,
+        SAMPLE_WIDTH * 8,
+        b"data",
+        pcm_size,
+    )
+
 
 async def convert_text_to_speech_gemini(
     text: str, voice_name: str = "Kore", api_key: str = None
-) -> tuple[str, float]:
+) -> tuple[bytes, float]:
     if not text.strip():
         raise ValueError("Empty text provided")
     if not api_key:
@@ -22,30 +62,18 @@ async def convert_text_to_speech_gemini(
     }
     headers = {"x-goog-api-key": api_key, "Content-Type": "application/json"}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-tts:generateContent",
-            json=payload,
-            headers=headers,
-            timeout=60.0,
-        )
-        response.raise_for_status()
+    response = await gemini_client.post(GEMINI_TTS_URL, json=payload, headers=headers)
+    response.raise_for_status()
 
-    result = response.json()
+    # The reply is almost entirely one base64 string; orjson parses it in C
+    # without the stdlib decoder's per-character string handling.
+    result = orjson.loads(response.content)
     audio_data = result["candidates"][0]["content"]["parts"][0]["inlineData"]["data"]
-    pcm_bytes = base64.b64decode(audio_data)
-
-    sample_width, channels, sample_rate = 2, 1, 24000
-    num_samples = len(pcm_bytes) // (sample_width * channels)
-    duration_seconds = num_samples / sample_rate
-
-    wav_buffer = io.BytesIO()
-    with wave.open(wav_buffer, "wb") as wav_file:
-        wav_file.setnchannels(channels)
-        wav_file.setsampwidth(sample_width)
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(pcm_bytes)
-
-    wav_buffer.seek(0)
-    audio_base64 = base64.b64encode(wav_buffer.read()).decode("utf-8")
-    return audio_base64, duration_seconds
+    pcm_bytes = await asyncio.to_thread(base64.b64decode, audio_data)
+
+    num_samples = len(pcm_bytes) // (SAMPLE_WIDTH * CHANNELS)
+    duration_seconds = num_samples / SAMPLE_RATE
+
+    # The format is fixed, so the header is packed directly in front of the
+    # PCM rather than written through wave and a BytesIO buffer.
+    return wav_header(len(pcm_bytes)) + pcm_bytes, duration_seconds
@@ -1,24 +1,27 @@
+# Voice aliases in precedence order: when several appear in the input, the
+# one listed first wins.
+VOICE_ALIASES = {
+    "alloy": "Alloy",
+    "echo": "Echo",
+    "fable": "Fable",
+    "onyx": "Onyx",
+    "nova": "Nova",
+    "shimmer": "Shimmer",
+    "kore": "Kore",
+    "male": "Onyx",
+    "man": "Onyx",
+    "female": "Nova",
+    "woman": "Nova",
+}
+
+
 def parse_tts_options(user_input: str) -> dict:
     options = {"voice_name": "Kore"}
     input_lower = user_input.lower()
 
-    if "alloy" in input_lower:
-        options["voice_name"] = "Alloy"
-    elif "echo" in input_lower:
-        options["voice_name"] = "Echo"
-    elif "fable" in input_lower:
-        options["voice_name"] = "Fable"
-    elif "onyx" in input_lower:
-        options["voice_name"] = "Onyx"
-    elif "nova" in input_lower:
-        options["voice_name"] = "Nova"
-    elif "shimmer" in input_lower:
-        options["voice_name"] = "Shimmer"
-    elif "kore" in input_lower:
-        options["voice_name"] = "Kore"
-    elif "male" in input_lower or "man" in input_lower:
-        options["voice_name"] = "Onyx"
-    elif "female" in input_lower or "woman" in input_lower:
-        options["voice_name"] = "Nova"
+    for alias, voice_name in VOICE_ALIASES.items():
+        if alias in input_lower:
+            options["voice_name"] = voice_name
+            break
 
     return options
@@ -0,0 +1,152 @@
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    import pymupdf
+
+# Text extraction run inside the PDF worker processes. Workers import this
+# module by reference for every task, so it depends on pymupdf alone and
+# none of the web app's packages.
+
+# get_text's own default for "text" (pymupdf.TEXTFLAGS_TEXT), spelled out
+# as TEXT_PRESERVE_LIGATURES | TEXT_PRESERVE_WHITESPACE | TEXT_MEDIABOX_CLIP
+# | TEXT_CID_FOR_UNKNOWN_UNICODE so this module can be imported without
+# loading pymupdf.
+PAGE_TEXT_FLAGS = 1 | 2 | 64 | 128
+# Pages whose content streams exceed this are extracted from an isolated copy
+LARGE_PAGE_CONTENT_SIZE = 1024 * 1024
+
+
+def open_pdf(pdf_bytes: Optional[bytes] = None) -> "pymupdf.Document":
+    """
+    Open a PDF document, or a new empty one when no bytes are given.
+
+    Extraction only runs in the PDF pool workers, so pymupdf is imported here
+    on first use rather than by the web process at startup.
+    """
+    import pymupdf
+
+    if pdf_bytes is None:
+        return pymupdf.open()
+    return pymupdf.open(stream=pdf_bytes, filetype="pdf")
+
+
+def warm_pdf_worker() -> None:
+    """
+    Import pymupdf when a pool worker starts, ahead of its first PDF.
+
+    Spawned workers receive this initializer by reference, so it has to stay
+    a module-level function.
+    """
+    import pymupdf  # noqa: F401
+
+
+def content_stream_size(doc: "pymupdf.Document", xref: int) -> int:
+    """
+    Return the raw (still compressed) size of a content stream.
+
+    The size is read from the stream's declared /Length, so the stream is
+    not copied out just to be measured. Only an indirect or missing length
+    falls back to reading the raw stream.
+    """
+    kind, value = doc.xref_get_key(xref, "Length")
+    if kind == "int":
+        return int(value)
+    return len(doc.xref_stream_raw(xref))
+
+
+def page_content_size(doc: "pymupdf.Document", page: "pymupdf.Page") -> int:
+    """Return the raw (still compressed) size of a page's content streams."""
+    return sum(content_stream_size(doc, xref) for xref in page.get_contents())
+
+
+def extract_isolated_page_text(doc: "pymupdf.Document", page_num: int) -> str:
+    """
+    Extract a page's text from a single-page copy of it.
+
+    On tagged PDFs, very heavy pages can take seconds because MuPDF walks the
+    document's structure tree. The copy carries no structure tree, so
+    extraction time tracks the page's own content.
+    """
+    page_doc = open_pdf()
+    try:
+        page_doc.insert_pdf(
+            doc, from_page=page_num, to_page=page_num, links=False, annots=False
+        )
+        return page_doc[0].get_text("text", flags=PAGE_TEXT_FLAGS, sort=False)
+    finally:
+        page_doc.close()
+
+
+def iter_pdf_pages(
+    doc: "pymupdf.Document", page_numbers: range
+) -> Iterator[tuple[int, str]]:
+    """Yield (page number, text) for each non-empty page in page_numbers."""
+    for page in doc.pages(page_numbers.start, page_numbers.stop):
+        if page_content_size(doc, page) > LARGE_PAGE_CONTENT_SIZE:
+            text = extract_isolated_page_text(doc, page.number)
+        else:
+            text = page.get_text("text", flags=PAGE_TEXT_FLAGS, sort=False)
+        if text and not text.isspace():
+            yield page.number + 1, text
+
+
+def format_page_section(page_num: int, text: str) -> str:
+    """Format a single page as a markdown section."""
+    return f"## Page {page_num}\n\n{text}"
+
+
+def join_page_sections(pages: list[tuple[int, str]]) -> str:
+    """
+    Join pages into one markdown document.
+
+    Headers and page texts are joined in a single pass, so each page's text
+    is copied once instead of first into its own section string.
+    """
+    parts = []
+    for page_num, text in pages:
+        if parts:
+            parts.append("\n\n")
+        parts.append(f"## Page {page_num}\n\n")
+        parts.append(text)
+    return "".join(parts)
+
+
+def extract_pdf_pages(pdf_bytes: bytes) -> list[tuple[int, str]]:
+    """Open a PDF once and return (page number, text) for its non-empty pages."""
+    doc = open_pdf(pdf_bytes)
+    try:
+        return list(iter_pdf_pages(doc, range(len(doc))))
+    finally:
+        doc.close()
+
+
+def extract_page_range(
+    pdf_bytes: bytes, start: int, stop: int
+) -> tuple[int, list[tuple[int, str]]]:
+    """
+    Extract the non-empty pages in [start, stop) of a PDF.
+
+    The document's page count is returned alongside them, so a caller
+    streaming batches learns how many remain from its first one.
+    """
+    doc = open_pdf(pdf_bytes)
+    try:
+        page_count = len(doc)
+        return page_count, list(
+            iter_pdf_pages(doc, range(start, min(stop, page_count)))
+        )
+    finally:
+        doc.close()
+
+
+def extract_pdf_text(pdf_bytes: bytes) -> str:
+    """Extract text from raw PDF bytes."""
+    try:
+        # Runs in a pool worker, which already gives files their
+        # parallelism; pages are extracted serially, as MuPDF is not safe
+        # to drive from several threads. Streaming reads the same pages
+        # through iter_pdf_pages, a batch at a time.
+        return join_page_sections(extract_pdf_pages(pdf_bytes))
+
+    except Exception as e:
+        return f"Error extracting text from PDF: {str(e)}"